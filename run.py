@@ -1,14 +1,76 @@
+import hashlib
+import html
+import json
+import math
 import os
+import re
 import sys
 import textwrap
+import time
 import requests
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from datetime import datetime, timedelta, timezone
 from email.utils import parsedate_to_datetime
-
-from openai import OpenAI
+from requests.adapters import HTTPAdapter
 
 
 RSS_URL_DEFAULT = "https://openai.com/blog/rss.xml"
+STATE_PATH_DEFAULT = ".cache/radar_state.json"
+RESPONSE_CACHE_PATH_DEFAULT = ".cache/openai_resp.json"
+RESPONSE_CACHE_TTL = 24 * 3600
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Acima disso, dois itens são considerados a mesma notícia (anúncio + follow-up)
+SIMILARITY_THRESHOLD = 0.85
+
+# Uma sessão só para RSS + Telegram: reaproveita conexões TCP/TLS
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_maxsize=10, pool_block=False))
+SESSION.headers["User-Agent"] = "RadarIA/1.0"
+
+# Data do cabeçalho no horário de Brasília (o runner do Actions roda em UTC)
+BRT = timezone(timedelta(hours=-3))
+
+TELEGRAM_API = "https://api.telegram.org"
+# Telegram aceita 4096 unidades UTF-16 por msg; deixa margem
+TELEGRAM_MAX_CHARS = 4000
+
+# Descrições do feed vêm com HTML; o modelo só precisa do texto
+DESCRIPTION_MAX_CHARS = 300
+_TAG_RE = re.compile(r"<[^>]+>")
+_strip_tags = _TAG_RE.sub
+_unescape = html.unescape
+
+# Teto de tokens do bloco de itens no prompt; tokenizer carregado sob demanda
+PROMPT_ITEMS_MAX_TOKENS = 2000
+# Estimativa barata (~4 chars/token) usada antes de carregar o tiktoken
+CHARS_PER_TOKEN = 4
+# O tiktoken baixa o vocabulário no primeiro uso; dentro de .cache ele é
+# preservado entre execuções pelo actions/cache
+TIKTOKEN_CACHE_DIR_DEFAULT = ".cache/tiktoken"
+_ENCODING = None
+_CLIENT = None
+
+
+def load_state(path: str):
+    """
+    Lê o estado persistido entre execuções (ETag/Last-Modified do RSS etc.).
+    Arquivo ausente ou corrompido = estado vazio.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def save_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        # Compacto: o estado guarda vetores de embedding (1536 floats cada)
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
 
 
 def _get_text(elem, tag):
@@ -18,37 +80,75 @@ def _get_text(elem, tag):
     return child.text.strip()
 
 
-def fetch_rss_items(rss_url: str, limit: int = 10):
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def parse_date_safe(s: str):
+    """
+    Datas do RSS 2.0 são RFC 2822; sem fuso explícito, assume UTC.
+    Retorna None se não der para interpretar.
+    """
+    try:
+        dt = parsedate_to_datetime(s)
+    except (TypeError, ValueError):
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _clean_text(s: str, width: int = DESCRIPTION_MAX_CHARS):
+    """
+    Remove tags/entidades HTML, normaliza espaços e corta em `width` chars
+    respeitando o fim de palavra.
+    """
+    clean = _unescape(_strip_tags(" ", s))
+    return textwrap.shorten(clean, width=width, placeholder="…")
+
+
+def fetch_rss_items(rss_url: str, limit: int = 10, cache: dict = None, cutoff: datetime = None):
     """
     Parseia RSS (XML) com biblioteca padrão.
     Retorna lista de itens com: title, link, published_dt, description.
+    Com `cutoff`, para no primeiro item publicado antes dele (itens sem
+    data ficam).
+
+    Se `cache` for passado, faz GET condicional com o ETag/Last-Modified
+    salvos nele e atualiza-o com os valores novos. Retorna None quando o
+    servidor responde 304 (feed não mudou).
     """
-    r = requests.get(rss_url, timeout=30, headers={"User-Agent": "RadarIA/1.0"})
+    headers = {}
+    if cache:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    r = SESSION.get(rss_url, timeout=30, headers=headers)
+    if r.status_code == 304:
+        return None
     r.raise_for_status()
 
-    root = ET.fromstring(r.text)
-
-    # RSS 2.0 típico: <rss><channel><item>...
-    channel = root.find("channel")
-    if channel is None:
-        # Alguns feeds usam namespaces; tentar achar channel na marra
-        channel = root.find(".//channel")
-    if channel is None:
-        return []
+    if cache is not None:
+        cache["etag"] = r.headers.get("ETag", "")
+        cache["last_modified"] = r.headers.get("Last-Modified", "")
 
+    # Stream-parse: processa cada <item> ao fechar a tag e descarta o nó,
+    # parando assim que junta `limit` itens válidos ou chega ao primeiro
+    # anterior ao `cutoff` (o feed vem do mais recente para o mais antigo).
     items = []
-    for item in channel.findall("item"):
+    for _, item in ET.iterparse(BytesIO(r.content), events=("end",)):
+        if item.tag != "item":
+            continue
+
         title = _get_text(item, "title")
         link = _get_text(item, "link")
-        desc = _get_text(item, "description")
+        desc = _clean_text(_get_text(item, "description"))
         pub = _get_text(item, "pubDate")
+        item.clear()
 
-        published_dt = None
-        if pub:
-            try:
-                published_dt = parsedate_to_datetime(pub)
-            except Exception:
-                published_dt = None
+        published_dt = parse_date_safe(pub) if pub else None
+        if cutoff and published_dt and published_dt < cutoff:
+            break
 
         if title and link:
             items.append(
@@ -60,15 +160,89 @@ def fetch_rss_items(rss_url: str, limit: int = 10):
                     "pub_raw": pub,
                 }
             )
+            if len(items) >= limit:
+                break
 
     # Ordena por data (mais recente primeiro). Itens sem data vão pro fim.
-    items.sort(key=lambda x: (x["published_dt"] is None, x["published_dt"]), reverse=True)
+    items.sort(key=lambda x: (x["published_dt"] is not None, x["published_dt"]), reverse=True)
     return items[:limit]
 
 
-def build_prompt(items, topic_name: str):
+def embed_items(client, items, cache: dict):
+    """
+    Retorna um embedding por item (título + trecho da descrição).
+    Usa `cache` (link -> vetor) e embeda só os que faltam, numa única chamada.
+    """
+    missing = [it for it in items if it["link"] not in cache]
+    if missing:
+        resp = client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=[f"{it['title']}\n{it['description']}" for it in missing],
+        )
+        for it, d in zip(missing, resp.data):
+            # 6 casas bastam para cosseno e encolhem o estado persistido
+            cache[it["link"]] = [round(x, 6) for x in d.embedding]
+    return [cache[it["link"]] for it in items]
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def dedupe_similar(items, vectors, threshold: float = SIMILARITY_THRESHOLD):
+    """
+    Remove itens quase duplicados (similaridade de cosseno > threshold),
+    mantendo o mais informativo: descrição mais longa, depois o mais recente.
+    Preserva a ordem original dos itens mantidos.
     """
-    Monta prompt para resumir 5 itens, PT-BR, 4–6 linhas, factual.
+    order = sorted(
+        range(len(items)),
+        key=lambda i: (
+            len(items[i]["description"]),
+            items[i]["published_dt"] is not None,
+            items[i]["published_dt"] or 0,
+        ),
+        reverse=True,
+    )
+    kept = []
+    for i in order:
+        if all(_cosine(vectors[i], vectors[j]) <= threshold for j in kept):
+            kept.append(i)
+    return [items[i] for i in sorted(kept)]
+
+
+def rank_items(items, vectors, history, now: datetime, cutoff: datetime):
+    """
+    Ordena por score = 0.5 * recência + 0.5 * novidade.
+    Recência: posição da data entre `cutoff` (0) e `now` (1); sem data = 0.
+    Novidade: 1 - maior similaridade com os itens enviados em `history`
+    (lista de embeddings dos boletins anteriores dentro da janela).
+    """
+    window = (now - cutoff).total_seconds() or 1.0
+
+    def score(i):
+        dt = items[i]["published_dt"]
+        recency = min(max((dt - cutoff).total_seconds() / window, 0.0), 1.0) if dt else 0.0
+        novelty = 1.0 - max((_cosine(vectors[i], h) for h in history), default=0.0)
+        return 0.5 * recency + 0.5 * novelty
+
+    return [items[i] for i in sorted(range(len(items)), key=score, reverse=True)]
+
+
+def items_key(items):
+    """
+    Hash estável do conjunto de itens (link, título, data), independente da ordem.
+    Usado para detectar que o boletim seria idêntico ao da última execução.
+    """
+    rows = sorted(f"{it['link']}|{it['title']}|{it['pub_raw']}" for it in items)
+    return hashlib.sha256("\n".join(rows).encode("utf-8")).hexdigest()
+
+
+def items_block(items):
+    """
+    Bloco de itens (título, data, link, descrição) que vai no prompt.
     """
     bullets = []
     for i, it in enumerate(items, start=1):
@@ -77,17 +251,61 @@ def build_prompt(items, topic_name: str):
             f"{i}. Título: {it['title']}\n"
             f"   Data: {dt}\n"
             f"   Link: {it['link']}\n"
-            f"   Trecho/descrição: {it['description'][:300]}"
+            f"   Trecho/descrição: {it['description']}"
         )
 
-    joined = "\n\n".join(bullets)
+    return "\n\n".join(bullets)
+
+
+def count_tokens(text: str):
+    """
+    Conta tokens com o tiktoken; se ele falhar (ex.: sem rede para baixar o
+    vocabulário), cai na estimativa por caracteres.
+    """
+    global _ENCODING
+    try:
+        if _ENCODING is None:
+            os.environ.setdefault("TIKTOKEN_CACHE_DIR", TIKTOKEN_CACHE_DIR_DEFAULT)
+            import tiktoken
+
+            _ENCODING = tiktoken.encoding_for_model("gpt-4o-mini")
+        return len(_ENCODING.encode(text))
+    except Exception as e:
+        print(f"Radar IA: tiktoken indisponível ({type(e).__name__}), estimando tokens.", file=sys.stderr)
+        return len(text) // CHARS_PER_TOKEN
+
+
+def fit_items_to_budget(items, max_tokens: int = PROMPT_ITEMS_MAX_TOKENS):
+    """
+    Se o bloco de itens passar de `max_tokens`, encurta as descrições na
+    mesma proporção (mantendo todos os itens) para limitar o custo de entrada.
+    """
+    block = items_block(items)
+    # Caso comum (descrições já cortadas): nem carrega o tokenizer
+    if len(block) <= CHARS_PER_TOKEN * max_tokens:
+        return items
+    total = count_tokens(block)
+    if total <= max_tokens:
+        return items
+    width = max(60, DESCRIPTION_MAX_CHARS * max_tokens // total)
+    return [
+        dict(it, description=textwrap.shorten(it["description"], width=width, placeholder="…"))
+        for it in items
+    ]
+
+
+def build_prompt(items, topic_name: str):
+    """
+    Monta prompt para resumir os itens, PT-BR, 4–6 linhas, factual.
+    """
+    joined = items_block(items)
 
     return f"""
-Você é um curador de notícias de IA. Gere uma mensagem ÚNICA em português (PT-BR), objetiva, factual (sem opinião), com 5 notícias do tópico: "{topic_name}".
+Você é um curador de notícias de IA. Gere uma mensagem ÚNICA em português (PT-BR), objetiva, factual (sem opinião), com {len(items)} notícias do tópico: "{topic_name}".
 
 Regras:
 - Cada notícia deve ter: título em negrito, 4–6 linhas de resumo (misto: o que aconteceu + por que importa), e o link.
-- Ranqueie implicitamente considerando: Relevância, Data mais recente, Novidade, Impacto.
+- Mantenha a ordem dos itens (já vêm ranqueados).
 - Evite paywall. Se parecer paywall, apenas cite o título + link e explique em 1 linha que é paywall.
 - Não invente fatos; use apenas o que está nos títulos/descrições fornecidos.
 
@@ -96,15 +314,124 @@ Itens coletados (RSS):
 """.strip()
 
 
+def get_openai_client(api_key: str):
+    """
+    Cliente OpenAI único por processo. `openai`/`httpx` só são importados
+    aqui, fora do caminho de inicialização do script.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        import httpx
+        from openai import OpenAI
+
+        _CLIENT = OpenAI(
+            api_key=api_key,
+            http_client=httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=5),
+            ),
+        )
+    return _CLIENT
+
+
+def tg_len(s: str):
+    """
+    Tamanho como o Telegram conta: unidades UTF-16 (emoji = 2).
+    """
+    return len(s.encode("utf-16-le")) // 2
+
+
+def truncate_for_telegram(text: str, limit: int = TELEGRAM_MAX_CHARS, placeholder: str = "\n\n(...)"):
+    """
+    Corta `text` para caber em `limit` unidades UTF-16, sem perder as
+    quebras de linha.
+    """
+    if tg_len(text) <= limit:
+        return text
+    limit -= tg_len(placeholder)
+    while tg_len(text) > limit:
+        text = text[: int(len(text) * 0.95)]
+    return text.rstrip() + placeholder
+
+
+def summarize(client, model: str, prompt: str, max_output_tokens: int, max_chars: int = TELEGRAM_MAX_CHARS):
+    """
+    Gera o resumo em streaming e interrompe assim que o texto passa de
+    `max_chars` (seria cortado no Telegram de qualquer forma).
+    """
+    parts, size = [], 0
+    with client.responses.stream(
+        model=model,
+        input=prompt,
+        max_output_tokens=max_output_tokens,
+    ) as stream:
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                parts.append(event.delta)
+                size += tg_len(event.delta)
+                if size > max_chars:
+                    break
+    return "".join(parts).strip()
+
+
+def response_cache_key(model: str, prompt: str, max_output_tokens: int):
+    # O teto de saída entra na chave: texto cortado por um limite menor não
+    # deve ser reaproveitado depois que o limite sobe
+    return hashlib.sha256(f"{model}|{max_output_tokens}|{prompt}".encode("utf-8")).hexdigest()
+
+
+def summarize_cached(client, model: str, prompt: str, max_output_tokens: int, cache_path: str = None):
+    """
+    Como `summarize`, mas reaproveita a resposta de um prompt idêntico gerada
+    nas últimas 24h (reexecuções manuais/CI). `cache_path=None` desliga o cache.
+    """
+    if not cache_path:
+        return summarize(client, model, prompt, max_output_tokens)
+
+    now = time.time()
+    cache = {
+        k: v
+        for k, v in load_state(cache_path).items()
+        if isinstance(v, dict) and now - v.get("ts", 0) < RESPONSE_CACHE_TTL
+    }
+    key = response_cache_key(model, prompt, max_output_tokens)
+    if key in cache:
+        return cache[key]["text"]
+
+    text = summarize(client, model, prompt, max_output_tokens)
+    if text:
+        cache[key] = {"ts": now, "text": text}
+        save_state(cache_path, cache)
+    return text
+
+
+def _prewarm_telegram():
+    # Abre a conexão TLS com o Telegram enquanto o modelo gera o texto
+    try:
+        SESSION.head(TELEGRAM_API, timeout=10)
+    except requests.RequestException:
+        pass
+
+
+def fallback_text(items, reason: str):
+    """
+    Fallback: manda só títulos+links para não ficar sem entrega.
+    """
+    lines = [f"Radar IA (fallback) — não consegui resumir via OpenAI.\nMotivo: {reason}\n"]
+    for it in items:
+        lines.append(f"- {it['title']}\n  {it['link']}")
+    return "\n".join(lines)
+
+
 def send_telegram_message(bot_token: str, chat_id: str, text: str):
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    url = f"{TELEGRAM_API}/bot{bot_token}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": text,
         "parse_mode": "Markdown",
-        "disable_web_page_preview": True,
+        "link_preview_options": {"is_disabled": True},
     }
-    r = requests.post(url, json=payload, timeout=30)
+    r = SESSION.post(url, json=payload, timeout=30)
     r.raise_for_status()
     return r.json()
 
@@ -122,6 +449,16 @@ def main():
     # MODELO: deixe configurável para evitar 403
     # Ex.: gpt-4o-mini, gpt-4o, ou outro que seu projeto tenha acesso
     openai_model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini").strip()
+    # Teto de saída: 5 notícias x 4–6 linhas cabem com folga em ~800 tokens
+    max_output_tokens = int(os.environ.get("OPENAI_MAX_OUTPUT_TOKENS", "800"))
+    days_lookback = int(os.environ.get("DAYS_LOOKBACK", "7"))
+    max_items = int(os.environ.get("MAX_ITEMS", "5"))
+    state_path = os.environ.get("RADAR_STATE_PATH", STATE_PATH_DEFAULT).strip()
+    # RADAR_NO_CACHE=1 ou --no-cache força nova chamada à OpenAI
+    no_cache = os.environ.get("RADAR_NO_CACHE", "").strip() == "1" or "--no-cache" in sys.argv[1:]
+    response_cache_path = (
+        None if no_cache else os.environ.get("RADAR_RESPONSE_CACHE_PATH", RESPONSE_CACHE_PATH_DEFAULT).strip()
+    )
 
     if not telegram_token or not telegram_chat_id:
         print("ERRO: TELEGRAM_BOT_TOKEN e/ou TELEGRAM_CHAT_ID não configurados.", file=sys.stderr)
@@ -131,42 +468,113 @@ def main():
         print("ERRO: OPENAI_API_KEY não configurada.", file=sys.stderr)
         sys.exit(1)
 
-    items = fetch_rss_items(rss_url, limit=10)
+    state = load_state(state_path)
+    # O cache HTTP só vale para a mesma URL de feed
+    # Cópia: o ETag novo só entra no estado quando o boletim for entregue
+    feed_cache = dict(state.get("feed") or {})
+    if feed_cache.get("url") != rss_url:
+        feed_cache = {"url": rss_url}
+
+    # Corte calculado uma vez; cada item vira só uma comparação
+    now = now_utc()
+    cutoff = now - timedelta(days=days_lookback)
+
+    # Busca o dobro do necessário para sobrar itens após a deduplicação
+    items = fetch_rss_items(rss_url, limit=2 * max_items, cache=feed_cache, cutoff=cutoff)
+
+    if items is None:
+        # 304: feed idêntico ao da última execução, nada novo para resumir
+        print("Radar IA: RSS sem mudanças desde a última execução (304).")
+        return
     if not items:
-        send_telegram_message(
-            telegram_token,
-            telegram_chat_id,
-            f"Radar IA: não consegui ler o RSS agora.\nFonte: {rss_url}",
-        )
+        # Semana parada: avisa uma vez e guarda o ETag para as próximas
+        # execuções caírem no 304
+        state["feed"] = feed_cache
+        key = items_key([])
+        if state.get("bulletin_key") != key:
+            send_telegram_message(
+                telegram_token,
+                telegram_chat_id,
+                f"Radar IA: nenhuma notícia nos últimos {days_lookback} dias.\nFonte: {rss_url}",
+            )
+            state["bulletin_key"] = key
+        save_state(state_path, state)
         return
 
-    top5 = items[:5]
-    prompt = build_prompt(top5, topic_name)
+    # Só agora há trabalho para a OpenAI: as saídas antecipadas acima (304,
+    # semana sem notícias) nem chegam a importar `openai`/`httpx`
+    client = get_openai_client(openai_key)
 
-    client = OpenAI(api_key=openai_key)
+    # Boletins anteriores dentro da janela, para medir novidade
+    history = [h for h in state.get("history") or [] if h.get("ts", 0) >= cutoff.timestamp()]
 
+    # Colapsa notícias repetidas antes de montar o prompt (menos tokens)
+    emb_cache = state.get("embeddings") or {}
+    links = [it["link"] for it in items]
+    vectors = None
     try:
-        resp = client.responses.create(
-            model=openai_model,
-            input=prompt,
-        )
-        # SDK atual retorna texto agregado em output_text
-        text = (resp.output_text or "").strip()
+        vectors = embed_items(client, items, emb_cache)
+        items = dedupe_similar(items, vectors)
+    except Exception as e:
+        print(f"Radar IA: deduplicação semântica ignorada ({type(e).__name__}).", file=sys.stderr)
+    # Guarda só os embeddings dos itens ainda presentes no feed
+    state["embeddings"] = {link: emb_cache[link] for link in links if link in emb_cache}
+
+    # A chave cobre todos os candidatos, não só o top: o ranking por
+    # novidade rebaixa o que já foi enviado e mudaria o top a cada execução
+    key = items_key(items)
+    sent_links = {h["link"] for h in history}
+    # Também pula quando todos os candidatos já foram enviados (ex.: um item
+    # saiu da janela e o conjunto mudou sem nada novo)
+    if state.get("bulletin_key") == key or all(it["link"] in sent_links for it in items):
+        # Nada novo desde o último boletim: não gasta tokens nem reenvia
+        print("Radar IA: nada novo desde o último boletim, nada a enviar.")
+        state["feed"] = feed_cache
+        save_state(state_path, state)
+        return
+
+    # Ranqueia localmente (o modelo não precisa ordenar)
+    if vectors is not None:
+        vectors = [emb_cache[it["link"]] for it in items]
+        prev = [h["embedding"] for h in history if h.get("embedding")]
+        items = rank_items(items, vectors, prev, now, cutoff)
+
+    top = items[:max_items]
+    prompt = build_prompt(fit_items_to_budget(top), topic_name)
+
+    is_fallback = False
+    try:
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            ex.submit(_prewarm_telegram)
+            text = summarize_cached(client, openai_model, prompt, max_output_tokens, response_cache_path)
         if not text:
-            raise RuntimeError("Resposta vazia do modelo.")
+            # Ex.: filtro de segurança ou corte antes do primeiro token
+            text, is_fallback = fallback_text(top, "resposta vazia do modelo"), True
     except Exception as e:
-        # Fallback: manda só títulos+links para não ficar sem entrega
-        lines = [f"Radar IA (fallback) — não consegui resumir via OpenAI.\nMotivo: {type(e).__name__}\n"]
-        for it in top5:
-            lines.append(f"- {it['title']}\n  {it['link']}")
-        text = "\n".join(lines)
+        text, is_fallback = fallback_text(top, type(e).__name__), True
+
+    header = f"*Radar IA — {now.astimezone(BRT).strftime('%d/%m/%Y')}*"
+    text = f"{header}\n\n{text}"
 
-    # Telegram tem limite ~4096 chars por msg. Se passar, corta.
-    if len(text) > 3800:
-        text = textwrap.shorten(text, width=3800, placeholder="\n\n(...)")
+    # Telegram tem limite de 4096 (UTF-16) por msg. Se passar, corta.
+    text = truncate_for_telegram(text)
 
     send_telegram_message(telegram_token, telegram_chat_id, text)
 
+    # Só marca o boletim como entregue depois de enviar um resumo de verdade.
+    # Com fallback (429, timeout, resposta vazia) o ETag, a chave e o
+    # histórico ficam como estavam, e a próxima execução tenta de novo.
+    if not is_fallback:
+        state["feed"] = feed_cache
+        state["bulletin_key"] = key
+        sent_at = now.timestamp()
+        state["history"] = history + [
+            {"link": it["link"], "ts": sent_at, "embedding": emb_cache.get(it["link"])}
+            for it in top
+            if it["link"] not in sent_links
+        ]
+    save_state(state_path, state)
+
 
 if __name__ == "__main__":
     main()